@@ -0,0 +1,53 @@
+import orjson
+import redis.asyncio as redis
+from functools import lru_cache
+from config import settings
+
+@lru_cache
+def get_redis() -> redis.Redis | None:
+    """
+    Redis shared across workers, or None when REDIS_URL is not set (in-process caching only).
+    Built lazily so each worker process opens its own connection pool.
+    """
+    return redis.Redis.from_url(settings.redis_url, decode_responses=True) if settings.redis_url else None
+
+# Transaction counts per filter, stored in one hash per user so writes can drop them all at once
+COUNT_TTL = 60
+
+async def get_cached_count(user_id: int, filter_key: str) -> int | None:
+    redis_client = get_redis()
+    if redis_client is None:
+        return None
+    total = await redis_client.hget(f"count:{user_id}", filter_key)
+    return int(total) if total is not None else None
+
+async def set_cached_count(user_id: int, filter_key: str, total: int):
+    redis_client = get_redis()
+    if redis_client is None:
+        return
+    key = f"count:{user_id}"
+    await redis_client.hset(key, filter_key, total)
+    await redis_client.expire(key, COUNT_TTL)
+
+# Monthly spending responses per user
+MONTHLY_TTL = 300
+
+async def get_cached_monthly(user_id: int) -> list | None:
+    redis_client = get_redis()
+    if redis_client is None:
+        return None
+    monthly = await redis_client.get(f"monthly:{user_id}")
+    return orjson.loads(monthly) if monthly is not None else None
+
+async def set_cached_monthly(user_id: int, monthly: list):
+    redis_client = get_redis()
+    if redis_client is not None:
+        await redis_client.set(f"monthly:{user_id}", orjson.dumps(monthly), ex=MONTHLY_TTL)
+
+async def invalidate_user_cache(user_id: int):
+    """
+    Drops cached aggregates for a user after their transactions change.
+    """
+    redis_client = get_redis()
+    if redis_client is not None:
+        await redis_client.delete(f"count:{user_id}", f"monthly:{user_id}")
@@ -0,0 +1,34 @@
+import os
+from pathlib import Path
+from pydantic import model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class Settings(BaseSettings):
+    """
+    Application configuration, read once from the environment or the .env file next to this module.
+    """
+    model_config = SettingsConfigDict(env_file=Path(__file__).with_name(".env"), extra="ignore")
+
+    database_url: str
+    secret_key: str
+    algorithm: str = "HS256"
+    access_token_expire_minutes: int = 30
+    openai_api_key: str
+    redis_url: str | None = None
+
+    # gunicorn worker processes, each with its own connection pool
+    web_concurrency: int = os.cpu_count() or 1
+    # Postgres connections shared by all workers; keep below the server's max_connections (100 by default).
+    # Every worker needs at least 2, so this must be at least 2 * web_concurrency
+    db_max_connections: int = 80
+
+    @model_validator(mode="after")
+    def check_connection_budget(self):
+        if self.web_concurrency * 2 > self.db_max_connections:
+            raise ValueError(
+                f"DB_MAX_CONNECTIONS={self.db_max_connections} cannot give {self.web_concurrency} workers "
+                "2 connections each; raise it or lower WEB_CONCURRENCY"
+            )
+        return self
+
+settings = Settings()
@@ -1,30 +1,55 @@
 
-import os
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+import time
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+from config import settings
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Retrieve the database URL
-DATABASE_URL = os.getenv("DATABASE_URL")
-print("DATABASE_URL:", os.getenv("DATABASE_URL"))
+DATABASE_URL = settings.database_url
+logger.info("DATABASE_URL: %s", make_url(DATABASE_URL).render_as_string(hide_password=True))
 
-if DATABASE_URL is None:
-    raise ValueError("DATABASE_URL is not set. Check your .env file.")
+# Plain postgresql:// URLs are served through the asyncpg driver
+if DATABASE_URL.startswith("postgresql://"):
+    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-# Database Engine
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Split the connection budget across workers: two thirds stay pooled, the rest is overflow
+connections_per_worker = max(2, settings.db_max_connections // settings.web_concurrency)
+POOL_SIZE = connections_per_worker * 2 // 3
+MAX_OVERFLOW = connections_per_worker - POOL_SIZE
+
+# Database Engine (pooled connections are health-checked and recycled hourly)
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=30,
+    pool_recycle=3600,
+    pool_pre_ping=True
+)
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
+# Log queries slower than this many milliseconds
+SLOW_QUERY_MS = 100
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the per-statement context so statements that raise leave nothing behind
+    context._query_start_time = time.perf_counter()
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _log_slow_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._query_start_time) * 1000
+    if elapsed_ms >= SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed_ms, statement)
+
 # Dependency to get the database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,31 +1,234 @@
 import openai
+import httpx
+import hashlib
+import json
 import os
-from dotenv import load_dotenv
+import re
+import yaml
+from functools import lru_cache
+from async_lru import alru_cache
+from config import settings
+from cache import get_redis
 
-load_dotenv()  # Load API keys from .env file
-
-openai.api_key = os.getenv("OPENAI_API_KEY")
+@lru_cache
+def get_client() -> openai.AsyncOpenAI:
+    """
+    OpenAI client for this worker process, built on first use.
+    Connections are kept alive and reused across requests.
+    """
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=30
+    )
+    return openai.AsyncOpenAI(api_key=settings.openai_api_key, http_client=http_client)
 
 CATEGORIES = ["Groceries", "Rent", "Bills", "Entertainment", "Transport", "Healthcare", "Education", "Shopping"]
+BATCH_SIZE = 25  # Descriptions packed into a single prompt
+CATEGORY_TTL = 30 * 24 * 3600  # Seconds a category stays cached in Redis
+MODEL = "gpt-4o-mini"  # Needed for json_schema response formats
+
+# Structured outputs that can only name the categories
+CATEGORY_ENUM = {"type": "string", "enum": CATEGORIES + ["Other"]}
+
+CATEGORY_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "expense_category",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"category": CATEGORY_ENUM},
+            "required": ["category"],
+            "additionalProperties": False
+        }
+    }
+}
+
+CATEGORIES_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "expense_categories",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"categories": {"type": "array", "items": CATEGORY_ENUM}},
+            "required": ["categories"],
+            "additionalProperties": False
+        }
+    }
+}
+
+def _category_request(description: str) -> dict:
+    """
+    Chat completion parameters for categorizing a single expense.
+    """
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": f"Classify this expense: '{description}' into one of the following categories: {', '.join(CATEGORIES)}."}],
+        "response_format": CATEGORY_FORMAT,
+        "temperature": 0,
+        "max_tokens": 16  # {"category": "..."} is well under this
+    }
+
+def _parse_category(content) -> str | None:
+    try:
+        return json.loads(content)["category"]
+    except (TypeError, ValueError, KeyError):
+        return None  # Refused or truncated reply
+
+class _NoCategory(Exception):
+    """
+    Raised by _categorize_cached so a failed reply is not cached as a category.
+    """
+
+def _normalize(description: str) -> str:
+    return " ".join(description.lower().split())
+
+def _load_rules() -> list[tuple[str, re.Pattern]]:
+    with open(os.path.join(os.path.dirname(__file__), "categories.yaml")) as f:
+        rules = yaml.safe_load(f)
+    return [(category, re.compile(rf"(?<!\w)(?:{'|'.join(patterns)})(?!\w)", re.IGNORECASE)) for category, patterns in rules.items()]
+
+RULES = _load_rules()
+
+def match_rules(description: str) -> str | None:
+    """
+    Categorizes obvious descriptions locally with the keyword rules in categories.yaml.
+    Returns None when no rule matches.
+    """
+    for category, pattern in RULES:
+        if pattern.search(description):
+            return category
+    return None
 
-def categorize_expense(description: str) -> str:
+async def categorize_expense(description: str) -> str:
     """
     Uses OpenAI's API to categorize an expense description into predefined categories.
+    Keyword rule matches and repeated descriptions (ignoring case and whitespace) skip the API call.
     """
-    prompt = f"Classify this expense: '{description}' into one of the following categories: {', '.join(CATEGORIES)}."
+    norm = _normalize(description)
+    category = match_rules(norm)
+    if category:
+        return category
+    try:
+        return await _categorize_cached(norm)
+    except _NoCategory:
+        return "Other"
 
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}]
-    )
+@alru_cache(maxsize=10000)
+async def _categorize_cached(norm: str) -> str:
+    key = f"exp:{hashlib.sha1(norm.encode()).hexdigest()}"
+    redis_client = get_redis()
+    if redis_client is not None:
+        category = await redis_client.get(key)
+        if category:
+            return category
 
-    category = response["choices"][0]["message"]["content"].strip()
-    
-    if category not in CATEGORIES:
-        category = "Other"
+    response = await get_client().chat.completions.create(**_category_request(norm))
+    category = _parse_category(response.choices[0].message.content)
+    if category is None:
+        raise _NoCategory(norm)  # alru_cache does not cache exceptions
 
+    if redis_client is not None:
+        await redis_client.set(key, category, ex=CATEGORY_TTL)
     return category
 
+async def categorize_expenses(descriptions: list[str]) -> list[str]:
+    """
+    Categorizes many expense descriptions with one OpenAI call per BATCH_SIZE items
+    not matched by the keyword rules. Returns the categories in the same order as the descriptions.
+    """
+    categories = [match_rules(_normalize(description)) for description in descriptions]
+    pending = [i for i, category in enumerate(categories) if category is None]
+
+    for start in range(0, len(pending), BATCH_SIZE):
+        indexes = pending[start:start + BATCH_SIZE]
+        chunk = [descriptions[i] for i in indexes]
+        numbered = "\n".join(f"{i}. {description}" for i, description in enumerate(chunk, start=1))
+        prompt = (
+            f"Classify each of the following expenses into one of {', '.join(CATEGORIES)}. "
+            f"Reply with one category per expense, in order.\n{numbered}"
+        )
+
+        response = await get_client().chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            response_format=CATEGORIES_FORMAT,
+            temperature=0
+        )
+
+        try:
+            replies = json.loads(response.choices[0].message.content)["categories"]
+        except (TypeError, ValueError, KeyError):
+            replies = []  # Refused or truncated reply
+        if len(replies) != len(chunk):
+            replies = ["Other"] * len(chunk)
+
+        for i, reply in zip(indexes, replies):
+            categories[i] = reply
+
+    return categories
+
+async def submit_batch(descriptions: list[str]) -> tuple[str | None, list[str | None]]:
+    """
+    Submits expense descriptions not matched by the keyword rules to OpenAI's Batch API
+    (24h completion window, half the cost). Each request's custom_id is the index of its description.
+    Returns the batch id (None when every description matched a rule) and the rule categories,
+    with None for the descriptions left to the batch.
+    """
+    categories = [match_rules(_normalize(description)) for description in descriptions]
+    lines = [
+        json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _category_request(description)
+        })
+        for i, (description, category) in enumerate(zip(descriptions, categories))
+        if category is None
+    ]
+    if not lines:
+        return None, categories
+
+    batch_file = await get_client().files.create(file=("expenses.jsonl", "\n".join(lines).encode()), purpose="batch")
+    batch = await get_client().batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id, categories
+
+# Batch statuses after which OpenAI does no more work; expired batches may still hold partial output
+BATCH_FINAL_STATUSES = {"completed", "expired", "failed", "cancelled"}
+
+async def get_batch_categories(batch_id: str, count: int) -> tuple[str, list[str] | None, list[dict]]:
+    """
+    Polls a batch submitted with submit_batch. Returns its status, the categories for the
+    `count` submitted descriptions in order once it has finished, and OpenAI's batch errors.
+    Categories stay None while the batch runs, and when it failed without producing any
+    output (e.g. input validation errors), so it can be resubmitted.
+    """
+    batch = await get_client().batches.retrieve(batch_id)
+    errors = [error.model_dump() for error in batch.errors.data or []] if batch.errors else []
+    if batch.status not in BATCH_FINAL_STATUSES:
+        return batch.status, None, errors
+    if batch.status == "failed" and not batch.output_file_id:
+        return batch.status, None, errors
+
+    categories = ["Other"] * count  # Failed or unfinished requests are missing from the output file
+    if batch.output_file_id:
+        output = await get_client().files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") == 200:
+                reply = response["body"]["choices"][0]["message"]["content"]
+                categories[int(result["custom_id"])] = _parse_category(reply) or "Other"
+
+    return batch.status, categories, errors
+
 # Example usage
 if __name__ == "__main__":
-    print(categorize_expense("Netflix monthly subscription"))
+    import asyncio
+    print(asyncio.run(categorize_expense("Netflix monthly subscription")))
@@ -0,0 +1,7 @@
+import os
+from config import settings
+
+# Run with: gunicorn main:app
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = settings.web_concurrency  # WEB_CONCURRENCY, one per CPU by default
+worker_class = "uvicorn_worker.UvicornWorker"
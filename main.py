@@ -1,65 +1,78 @@
 from fastapi import FastAPI, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, insert, update, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from database import engine, Base, get_db
-from models import User, Transaction
-from auth import hash_password, verify_password, create_access_token, get_current_user
+import base64
+import hashlib
+from database import get_db
+from models import User, Transaction, CategorizationBatch
+from auth import hash_password, verify_and_update_password, create_access_token, get_current_user
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.sql import func
-from expense_categorizer import categorize_expense  # Import categorization function
-from pydantic import BaseModel
+from cache import get_cached_count, set_cached_count, get_cached_monthly, set_cached_monthly, invalidate_user_cache
+from expense_categorizer import categorize_expense, categorize_expenses, submit_batch, get_batch_categories  # Import categorization functions
+from pydantic import BaseModel, ConfigDict, EmailStr, StringConstraints
+from typing import Annotated
 
 #  Initialize FastAPI app (only once)
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
-#  Load environment variables
-
-
-#  Ensure database tables are created
-Base.metadata.create_all(bind=engine)
+#  Database schema is managed by Alembic: run `alembic upgrade head` when deploying
 
 #  Root Route
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Hello, FastAPI is running!"}
 
 #  Pydantic Models
 class UserRegister(BaseModel):
-    username: str
-    email: str
+    model_config = ConfigDict(frozen=True)  # Passwords are hashed exactly as sent, so only the username is stripped
+
+    username: Annotated[str, StringConstraints(strip_whitespace=True)]
+    email: EmailStr
     password: str
 
 class TransactionCreate(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, frozen=True)
+
     amount: float
     description: str
 
 #  Register a new user
 @app.post("/register/")
-def register(user_data: UserRegister, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.username == user_data.username).first():
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(User).where(User.username == user_data.username)):
         raise HTTPException(status_code=400, detail="Username already exists")
 
-    hashed_pwd = hash_password(user_data.password)
+    hashed_pwd = await run_in_threadpool(hash_password, user_data.password)  # Hashing is CPU bound, keep it off the event loop
     new_user = User(username=user_data.username, email=user_data.email, hashed_password=hashed_pwd)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     return {"message": "User registered successfully"}
 
 #  Login to get JWT token
 @app.post("/login/")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
+    valid, new_hash = await run_in_threadpool(verify_and_update_password, form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Incorrect username or password")
+    if new_hash:  # Upgrade legacy bcrypt hashes to Argon2id
+        user.hashed_password = new_hash
+        await db.commit()
+
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
 #  Add a transaction
 @app.post("/transactions/")
-def add_transaction(transaction: TransactionCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    category = categorize_expense(transaction.description)  # AI categorization
+async def add_transaction(transaction: TransactionCreate, db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    category = await categorize_expense(transaction.description)  # AI categorization
 
     new_transaction = Transaction(
         amount=transaction.amount,
@@ -69,47 +82,173 @@ def add_transaction(transaction: TransactionCreate, db: Session = Depends(get_db
         user_id=user.id
     )
     db.add(new_transaction)
-    db.commit()
-    db.refresh(new_transaction)
+    await db.commit()
+    await invalidate_user_cache(user.id)
     return new_transaction
 
-#  Get transactions with filters & pagination
+#  Columns returned for stored transactions
+TRANSACTION_COLUMNS = (Transaction.id, Transaction.amount, Transaction.category, Transaction.description, Transaction.date, Transaction.user_id)
+
+#  Insert many transactions in one round trip, returning the stored rows in input order
+async def insert_transactions(db: AsyncSession, rows: list[dict]):
+    if not rows:
+        return []
+    result = await db.execute(insert(Transaction).returning(*TRANSACTION_COLUMNS, sort_by_parameter_order=True), rows)
+    return result.mappings().all()
+
+#  Add many transactions with a single categorization call
+@app.post("/transactions/bulk/")
+async def add_transactions_bulk(transactions: list[TransactionCreate], db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    categories = await categorize_expenses([t.description for t in transactions])  # AI categorization
+    now = datetime.utcnow()
+
+    new_transactions = await insert_transactions(db, [
+        {"amount": t.amount, "category": category, "description": t.description, "date": now, "user_id": user.id}
+        for t, category in zip(transactions, categories)
+    ])
+    await db.commit()
+    await invalidate_user_cache(user.id)
+    return new_transactions
+
+#  Queue a large import for categorization through the OpenAI Batch API
+@app.post("/transactions/bulk/async/")
+async def submit_transactions_batch(transactions: list[TransactionCreate], db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    if not transactions:
+        raise HTTPException(status_code=400, detail="No transactions to import")
+
+    batch_id, categories = await submit_batch([t.description for t in transactions])
+
+    if batch_id is None:  # Every description matched a keyword rule, nothing to wait for
+        now = datetime.utcnow()
+        new_transactions = await insert_transactions(db, [
+            {"amount": t.amount, "category": category, "description": t.description, "date": now, "user_id": user.id}
+            for t, category in zip(transactions, categories)
+        ])
+        await db.commit()
+        await invalidate_user_cache(user.id)
+        return {"batch_id": None, "status": "completed", "transactions": new_transactions}
+
+    db.add(CategorizationBatch(
+        id=batch_id,
+        items=[
+            {"amount": t.amount, "description": t.description, "category": category}
+            for t, category in zip(transactions, categories)
+        ],
+        user_id=user.id
+    ))
+    await db.commit()
+    return {"batch_id": batch_id, "status": "submitted"}
+
+#  Poll a queued import and store its transactions once categorized
+@app.get("/transactions/bulk/{batch_id}")
+async def get_transactions_batch(batch_id: str, db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    batch = await db.scalar(select(CategorizationBatch).where(CategorizationBatch.id == batch_id, CategorizationBatch.user_id == user.id))
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if batch.completed:
+        return {"batch_id": batch_id, "status": "completed"}
+
+    status, categories, errors = await get_batch_categories(batch_id, len(batch.items))
+    if categories is None:
+        response = {"batch_id": batch_id, "status": status}
+        if errors:
+            response["errors"] = errors
+        return response
+
+    # Claim the batch atomically so concurrent polls store its transactions only once
+    claimed = await db.scalar(
+        update(CategorizationBatch)
+        .where(CategorizationBatch.id == batch_id, CategorizationBatch.completed.is_(False))
+        .values(completed=True)
+        .returning(CategorizationBatch.id)
+    )
+    if claimed is None:
+        return {"batch_id": batch_id, "status": "completed"}
+
+    new_transactions = await insert_transactions(db, [
+        {"amount": item["amount"], "category": item.get("category") or category, "description": item["description"], "date": batch.created_at, "user_id": user.id}
+        for item, category in zip(batch.items, categories)
+    ])
+    await db.commit()
+    await invalidate_user_cache(user.id)
+    return {"batch_id": batch_id, "status": status, "transactions": new_transactions}
+
+#  Pagination cursors encode the (date, id) of the last transaction on a page
+def encode_cursor(transaction) -> str:
+    return base64.urlsafe_b64encode(f"{transaction['date'].isoformat()}|{transaction['id']}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        date, transaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(date), int(transaction_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+#  Get transactions with filters & keyset pagination (newest first)
 @app.get("/transactions/")
-def get_transactions(
-    db: Session = Depends(get_db),
+async def get_transactions(
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
     category: str = None,
     start_date: str = None,
     end_date: str = None,
-    page: int = Query(1, alias="page", ge=1),
-    limit: int = Query(10, alias="limit", ge=1, le=100)
+    cursor: str | None = None,
+    limit: int = Query(10, alias="limit", ge=1, le=100),
+    include_total: bool = False
 ):
-    query = db.query(Transaction).filter(Transaction.user_id == user.id)
+    filters = [Transaction.user_id == user.id]
 
     if category:
-        query = query.filter(Transaction.category == category)
+        filters.append(Transaction.category == category)
     if start_date:
-        query = query.filter(Transaction.date >= datetime.fromisoformat(start_date))
+        filters.append(Transaction.date >= datetime.fromisoformat(start_date))
     if end_date:
-        query = query.filter(Transaction.date <= datetime.fromisoformat(end_date))
+        filters.append(Transaction.date <= datetime.fromisoformat(end_date))
+
+    response = {"limit": limit}
+    if include_total:
+        filter_key = hashlib.sha1(f"{category}|{start_date}|{end_date}".encode()).hexdigest()
+        total = await get_cached_count(user.id, filter_key)
+        if total is None:
+            # Count straight off the filters (no ORDER BY, no columns) so Postgres can use an index-only scan
+            total = await db.scalar(select(func.count()).select_from(Transaction).where(*filters))
+            await set_cached_count(user.id, filter_key, total)
+        response["total"] = total
+
+    query = select(*TRANSACTION_COLUMNS).where(*filters)  # Plain rows, no ORM objects to build
 
-    total = query.count()
-    transactions = query.offset((page - 1) * limit).limit(limit).all()
+    if cursor:
+        query = query.where(tuple_(Transaction.date, Transaction.id) < decode_cursor(cursor))
+    query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
 
-    return {"total": total, "page": page, "limit": limit, "transactions": transactions}
+    transactions = (await db.execute(query.limit(limit + 1))).mappings().all()  # One extra row tells us if there is a next page
+    has_next = len(transactions) > limit
+    transactions = transactions[:limit]
+
+    response["next_cursor"] = encode_cursor(transactions[-1]) if has_next else None
+    response["transactions"] = transactions
+    return response
 
 #  Monthly spending insights
 @app.get("/analytics/monthly/")
-def get_monthly_spending(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+async def get_monthly_spending(db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    cached = await get_cached_monthly(user.id)
+    if cached is not None:
+        return cached
+
+    month = func.date_trunc('month', Transaction.date)
     monthly_data = (
-        db.query(
-            func.date_trunc('month', Transaction.date).label("month"),
-            func.sum(Transaction.amount).label("total_spent")
+        await db.execute(
+            select(
+                month.label("month"),
+                func.sum(Transaction.amount).label("total_spent")
+            )
+            .where(Transaction.user_id == user.id)
+            .group_by(month)
+            .order_by(month)
         )
-        .filter(Transaction.user_id == user.id)
-        .group_by("month")
-        .order_by("month")
-        .all()
-    )
+    ).all()
 
-    return [{"month": str(data.month), "total_spent": float(data.total_spent)} for data in monthly_data]
+    monthly = [{"month": data.month, "total_spent": data.total_spent} for data in monthly_data]
+    await set_cached_monthly(user.id, monthly)
+    return monthly
@@ -0,0 +1,28 @@
+"""composite transaction indexes per user
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-14 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_txn_user_date', 'transactions', ['user_id', sa.text('date DESC')], unique=False)
+    op.create_index('ix_txn_user_cat', 'transactions', ['user_id', 'category'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_txn_user_cat', table_name='transactions')
+    op.drop_index('ix_txn_user_date', table_name='transactions')
@@ -0,0 +1,30 @@
+"""covering (user_id, date) index for monthly totals
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-14 10:00:00.000000
+
+Replaces ix_txn_user_date: the covering index serves the same date-ordered
+lookups and lets monthly aggregation run as an index-only scan.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_txn_user_date_amt', 'transactions', ['user_id', 'date'], unique=False, postgresql_include=['amount'])
+    op.drop_index('ix_txn_user_date', table_name='transactions')
+
+
+def downgrade() -> None:
+    op.create_index('ix_txn_user_date', 'transactions', ['user_id', sa.text('date DESC')], unique=False)
+    op.drop_index('ix_txn_user_date_amt', table_name='transactions')
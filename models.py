@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -24,3 +24,17 @@ class Transaction(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     owner = relationship("User", back_populates="transactions")
+
+# Per-user listings filter on date or category; amount is included so monthly
+# totals are answered from the date index alone (it is scanned backwards for newest first)
+Index("ix_txn_user_date_amt", Transaction.user_id, Transaction.date, postgresql_include=["amount"])
+Index("ix_txn_user_cat", Transaction.user_id, Transaction.category)
+
+class CategorizationBatch(Base):
+    __tablename__ = "categorization_batches"
+
+    id = Column(String, primary_key=True)  # OpenAI batch id
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    items = Column(JSON, nullable=False)  # [{"amount": ..., "description": ..., "category": rule match or None}] in submission order
+    completed = Column(Boolean, default=False, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)